@@ -1,13 +1,42 @@
-from reportlab.pdfgen import canvas
+LINES = [
+    (750, "Hello World"),
+    (730, "This is a test PDF for ScrapPY."),
+    (710, "Password: secret_password"),
+    (690, "admin"),
+    (670, "root"),
+]
+
+def build_pdf():
+    # Minimal single-page PDF (A4, Helvetica 12) written by hand instead of via reportlab
+    content = "".join(
+        "BT /F1 12 Tf 100 %d Td (%s) Tj ET\n" % (y, text) for y, text in LINES
+    ).encode("latin-1")
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595.2756 841.8898] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+    ]
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for num, obj in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (num, obj)
+
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+PDF = build_pdf()
 
 def create_pdf(filename):
-    c = canvas.Canvas(filename)
-    c.drawString(100, 750, "Hello World")
-    c.drawString(100, 730, "This is a test PDF for ScrapPY.")
-    c.drawString(100, 710, "Password: secret_password")
-    c.drawString(100, 690, "admin")
-    c.drawString(100, 670, "root")
-    c.save()
+    with open(filename, "wb") as f:
+        f.write(PDF)
 
 if __name__ == "__main__":
     create_pdf("test.pdf")
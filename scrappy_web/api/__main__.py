@@ -0,0 +1,26 @@
+"""
+Production entry point: python -m scrappy_web.api
+
+Runs the API on uvloop + httptools when they are installed, falling back to
+the stock asyncio loop and h11 parser otherwise.
+"""
+import importlib.util
+import os
+import uvicorn
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def main():
+    uvicorn.run(
+        "scrappy_web.api.main:app",
+        host=os.getenv("SCRAPPY_HOST", "127.0.0.1"),
+        port=int(os.getenv("SCRAPPY_PORT", "8000")),
+        # Job state lives in process memory, so keep a single worker by default
+        workers=int(os.getenv("SCRAPPY_WORKERS", "1")),
+        loop="uvloop" if _available("uvloop") else "asyncio",
+        http="httptools" if _available("httptools") else "h11",
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from collections import OrderedDict
 import bcrypt
+import hashlib
+import hmac
 import os
+import secrets
+import time
 from .models import TokenData
 from .config import settings
 
@@ -15,50 +22,140 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/token")
 
+# Verified token cache: keyed token digest -> (exp, user). Skips jwt.decode on repeat requests.
+TOKEN_CACHE_MAXSIZE = 4096
+_token_cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+# Keying the digest with the secret stops clients from choosing cache keys
+_TOKEN_CACHE_KEY = hashlib.sha256(SECRET_KEY.encode('utf-8')).digest()
+
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode('utf-8'), digest_size=32, key=_TOKEN_CACHE_KEY).digest()
+
+# Argon2id password hashing. Cost knobs: time_cost (passes) and memory_cost (KiB).
+# Dev mode uses minimal costs for fast tests/benchmarks.
+ARGON2_TIME_COST = 1 if settings.DEV_MODE else 2
+ARGON2_MEMORY_COST = 1024 if settings.DEV_MODE else 19 * 1024
+_ph = PasswordHasher(time_cost=ARGON2_TIME_COST, memory_cost=ARGON2_MEMORY_COST, parallelism=1)
+
 # Mock User Database (In-memory for MVP)
 # Username: admin, Password: password123
-# Hash generated with: bcrypt.hashpw(b"password123", bcrypt.gensalt()).decode()
+# Hash generated with: _ph.hash("password123")
 FAKE_USERS_DB = {
     "admin": {
         "username": "admin",
-        "hashed_password": "$2b$12$Jh1yyEsL1oU/EV4.RsrUFeFtZHE5GpzHbPV0xEStEOWORlnFpTf/i",
+        "hashed_password": "$argon2id$v=19$m=19456,t=2,p=1$dcyNwNmF9vedpPBpP2cOIg$GOyMzFdItWnXClwTZ2xzAL24AJs2p79fvLhhxwkdQ2E",
         "disabled": False,
     }
 }
 
+if settings.DEV_MODE:
+    FAKE_USERS_DB["admin"]["hashed_password"] = _ph.hash("password123")
+
+# Verified against when the username is unknown so every login pays the hashing cost
+DUMMY_HASH = _ph.hash("x")
+
+# Short-lived cache of successful verify_password checks: keyed blake2b(hash, password) -> expires_at.
+# Failures and DUMMY_HASH checks are never cached, so cache hits can't reveal unknown usernames.
+VERIFY_CACHE_MAXSIZE = 1024
+VERIFY_CACHE_TTL = 60
+_verify_cache: "OrderedDict[bytes, float]" = OrderedDict()
+# Per-process key so cached digests can't be used to guess passwords offline
+_VERIFY_CACHE_KEY = secrets.token_bytes(32)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    key = hashlib.blake2b(digest_size=16, key=_VERIFY_CACHE_KEY)
+    key.update(hashed_password.encode('utf-8'))
+    key.update(b"\0")
+    key.update(plain_password.encode('utf-8'))
+    key = key.digest()
+
+    now = time.monotonic()
+    expires_at = _verify_cache.get(key)
+    if expires_at is not None and now < expires_at:
+        return True
+
+    if hashed_password.startswith("$2"):
+        # Legacy bcrypt hash
+        ok = bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    else:
+        try:
+            ok = _ph.verify(hashed_password, plain_password)
+        except (VerificationError, InvalidHashError):
+            ok = False
+    if ok and hashed_password != DUMMY_HASH:
+        _verify_cache[key] = now + VERIFY_CACHE_TTL
+        _verify_cache.move_to_end(key)
+        if len(_verify_cache) > VERIFY_CACHE_MAXSIZE:
+            _verify_cache.popitem(last=False)
+    return ok
 
 def get_user(db, username: str):
-    if username in db:
-        return db[username]
-    return None
+    # Compare against every key without early exit so timing doesn't reveal which users exist
+    candidate = username.encode('utf-8')
+    match = None
+    for key, user in db.items():
+        if hmac.compare_digest(key.encode('utf-8'), candidate):
+            match = user
+    return match
+
+def authenticate_user(username: str, password: str) -> Optional[dict]:
+    """
+    Check credentials in constant time with respect to username existence.
+    Unknown users are checked against DUMMY_HASH so timing does not reveal them.
+    """
+    user = get_user(FAKE_USERS_DB, username)
+    hashed = user['hashed_password'] if user else DUMMY_HASH
+    ok = verify_password(password, hashed)
+    return user if (user is not None) & ok else None
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # Epoch seconds, as the JWT exp claim is encoded anyway
+    expires_in = int(expires_delta.total_seconds()) if expires_delta else 15 * 60
+    to_encode["exp"] = int(time.time()) + expires_in
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def _verify_token(token: str):
+    """
+    Decode a JWT and resolve its user.
+    Returns (exp, user) on success, None if the token or user is invalid.
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            return None
         token_data = TokenData(username=username)
     except JWTError:
-        raise credentials_exception
+        return None
     user = get_user(FAKE_USERS_DB, username=token_data.username)
     if user is None:
+        return None
+    return payload.get("exp"), user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    cache_key = _token_cache_key(token)
+    cached = _token_cache.get(cache_key)
+    if cached is not None:
+        exp, user = cached
+        if time.time() < exp:
+            _token_cache.move_to_end(cache_key)
+            return user
+        # Expired: evict and fall through so jwt.decode reports it
+        _token_cache.pop(cache_key, None)
+
+    verified = _verify_token(token)
+    if verified is None:
         raise credentials_exception
+    exp, user = verified
+    if exp is not None:
+        _token_cache[cache_key] = (exp, user)
+        if len(_token_cache) > TOKEN_CACHE_MAXSIZE:
+            _token_cache.popitem(last=False)
     return user
@@ -12,15 +12,30 @@ class Settings:
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("SCRAPPY_TOKEN_EXPIRE_MINUTES", "30"))
     
+    # Development only: minimal Argon2 time/memory costs for the seeded user. Never set in production.
+    DEV_MODE: bool = os.getenv("SCRAPPY_DEV_MODE") == "1"
+    
     # File Upload Limits
     MAX_FILE_SIZE_MB: int = int(os.getenv("SCRAPPY_MAX_FILE_SIZE_MB", "10"))
     MAX_FILE_SIZE_BYTES: int = MAX_FILE_SIZE_MB * 1024 * 1024
-    ALLOWED_CONTENT_TYPES: list = ["application/pdf"]
+    MAX_FILE_SIZE_ERROR: str = f"File too large. Maximum size is {MAX_FILE_SIZE_MB}MB"
+    ALLOWED_CONTENT_TYPES: frozenset = frozenset(["application/pdf"])
     
     # Rate Limiting
     LOGIN_RATE_LIMIT: str = os.getenv("SCRAPPY_LOGIN_RATE_LIMIT", "5/minute")
     JOB_RATE_LIMIT: str = os.getenv("SCRAPPY_JOB_RATE_LIMIT", "10/minute")
     
+    # CORS: comma-separated origins allowed to call /api/*
+    CORS_ALLOW_ORIGINS: list = [
+        origin.strip() for origin in os.getenv("SCRAPPY_CORS_ORIGINS", "*").split(",") if origin.strip()
+    ]
+    
+    # Worker processes that run ScrapPY jobs
+    WORKER_PROCESSES: int = int(os.getenv("SCRAPPY_WORKER_PROCESSES", "2"))
+    
+    # Job store
+    JOB_TTL_SECONDS: int = int(os.getenv("SCRAPPY_JOB_TTL_SECONDS", "3600"))
+    
     # Paths
     UPLOAD_DIR: str = os.getenv("SCRAPPY_UPLOAD_DIR", os.path.join(os.path.dirname(__file__), "../../temp_uploads"))
     
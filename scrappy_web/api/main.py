@@ -2,21 +2,22 @@ from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, F
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-import shutil
+import aiofiles
 import os
-import uuid
-from datetime import datetime, timedelta
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
 
 from .config import settings
 from .auth import (
-    create_access_token, get_current_user, 
-    ACCESS_TOKEN_EXPIRE_MINUTES, FAKE_USERS_DB, verify_password
+    authenticate_user, create_access_token, get_current_user,
+    ACCESS_TOKEN_EXPIRE_MINUTES
 )
-from .models import Token, JobResponse, JobResult, JobStatus, ScrapMode
+from .models import Token, Job, JobResponse, JobResult, JobStatus, ScrapMode
 from .worker import run_scrappy_job, JOBS
 
 # Setup Rate Limiting
@@ -29,10 +30,27 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-# CORS (Restrict in production)
+class FastCORSMiddleware:
+    """
+    Applies CORS only to cross-origin /api/ requests.
+    Same-origin requests (no Origin header) and /ui/ assets skip CORS handling entirely.
+    """
+    
+    def __init__(self, app, **options):
+        self.app = app
+        self.cors = CORSMiddleware(app, **options)
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/api/"):
+            for name, _ in scope["headers"]:
+                if name == b"origin":
+                    return await self.cors(scope, receive, send)
+        await self.app(scope, receive, send)
+
+# CORS (Restrict in production via SCRAPPY_CORS_ORIGINS)
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
+    FastCORSMiddleware,
+    allow_origins=settings.CORS_ALLOW_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -45,6 +63,32 @@ app.mount("/ui", StaticFiles(directory=ui_path, html=True), name="ui")
 # Temp storage
 UPLOAD_DIR = settings.UPLOAD_DIR
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+_JOB_PATH_PREFIX = os.path.join(UPLOAD_DIR, "")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def _new_id() -> str:
+    # 128 random bits as 32 hex chars; also used as the on-disk filename
+    return secrets.token_hex(16)
+
+def _job_response(job: Job) -> JobResponse:
+    # Job records are built internally, so skip re-validation
+    return JobResponse.model_construct(
+        job_id=job.job_id,
+        status=job.status,
+        created_at=datetime.fromtimestamp(job.created_at, timezone.utc),
+        mode=job.mode,
+        filename=job.filename
+    )
+
+def _job_etag(job: Job) -> str:
+    # Job output and error are set once, so these change whenever the job does
+    return f'W/"{job.status.value}-{len(job.output)}-{int(job.error is not None)}"'
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    return etag in (tag.strip() for tag in if_none_match.split(","))
 
 @app.get("/")
 async def root():
@@ -53,8 +97,8 @@ async def root():
 @app.post("/api/v1/auth/token", response_model=Token)
 @limiter.limit(settings.LOGIN_RATE_LIMIT)
 async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
-    user = FAKE_USERS_DB.get(form_data.username)
-    if not user or not verify_password(form_data.password, user['hashed_password']):
+    user = authenticate_user(form_data.username, form_data.password)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -83,62 +127,89 @@ async def create_job(
     if file.content_type not in settings.ALLOWED_CONTENT_TYPES:
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Validate file size
-    file.file.seek(0, 2)  # Seek to end
-    file_size = file.file.tell()
-    file.file.seek(0)  # Reset to beginning
-    
-    if file_size > settings.MAX_FILE_SIZE_BYTES:
-        raise HTTPException(
-            status_code=413, 
-            detail=f"File too large. Maximum size is {settings.MAX_FILE_SIZE_MB}MB"
-        )
+    # Starlette has already spooled the upload, so reject oversized files before writing anything
+    if file.size is not None and file.size > settings.MAX_FILE_SIZE_BYTES:
+        raise HTTPException(status_code=413, detail=settings.MAX_FILE_SIZE_ERROR)
     
-    # Validate PDF magic bytes
-    header = await file.read(5)
-    await file.seek(0)
-    if header != b'%PDF-':
+    # Validate PDF magic bytes on the first chunk, before touching disk
+    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    if len(chunk) < 5 or chunk[:5] != b'%PDF-':
         raise HTTPException(status_code=400, detail="Invalid PDF file")
-
-    job_id = str(uuid.uuid4())
-    file_location = os.path.join(UPLOAD_DIR, f"{job_id}.pdf")
     
-    with open(file_location, "wb+") as file_object:
-        shutil.copyfileobj(file.file, file_object)
+    job_id = _new_id()
+    file_location = f"{_JOB_PATH_PREFIX}{job_id}.pdf"
+    
+    # Stream to disk in chunks; the running size check is a backstop for unknown sizes
+    size = 0
+    try:
+        async with aiofiles.open(file_location, "wb") as file_object:
+            while chunk:
+                size += len(chunk)
+                if size > settings.MAX_FILE_SIZE_BYTES:
+                    raise HTTPException(status_code=413, detail=settings.MAX_FILE_SIZE_ERROR)
+                await file_object.write(chunk)
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    except BaseException:
+        # Don't leave partial uploads behind (size limit, write errors, cancellation)
+        if os.path.exists(file_location):
+            os.remove(file_location)
+        raise
     
     # Initialize Job
-    JOBS[job_id] = {
-        "job_id": job_id,
-        "status": JobStatus.QUEUED,
-        "created_at": datetime.utcnow(),
-        "mode": mode,
-        "filename": file.filename,
-        "user": current_user['username']
-    }
+    job = Job(
+        job_id=job_id,
+        status=JobStatus.QUEUED,
+        created_at=time.time(),
+        mode=mode,
+        filename=file.filename,
+        user=current_user['username']
+    )
+    JOBS[job_id] = job
     
     # Schedule Background Task
     background_tasks.add_task(run_scrappy_job, job_id, file_location, mode)
     
-    return JOBS[job_id]
+    return _job_response(job)
 
 @app.get("/api/v1/jobs/{job_id}", response_model=JobResponse)
-async def get_job_status(job_id: str, current_user: dict = Depends(get_current_user)):
-    if job_id not in JOBS:
+async def get_job_status(
+    job_id: str,
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user)
+):
+    job = JOBS.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
-    return JOBS[job_id]
+    
+    # Pollers get a bodyless 304 until the job changes
+    etag = _job_etag(job)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return _job_response(job)
 
 @app.get("/api/v1/jobs/{job_id}/result", response_model=JobResult)
-async def get_job_result(job_id: str, current_user: dict = Depends(get_current_user)):
-    if job_id not in JOBS:
+async def get_job_result(
+    job_id: str,
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user)
+):
+    job = JOBS.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = JOBS[job_id]
-    if job["status"] != JobStatus.COMPLETED and job["status"] != JobStatus.FAILED:
+    if job.status != JobStatus.COMPLETED and job.status != JobStatus.FAILED:
         raise HTTPException(status_code=400, detail="Job not finished")
-        
-    return JobResult(
+    
+    etag = _job_etag(job)
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return JobResult.model_construct(
         job_id=job_id,
-        status=job["status"],
-        output=job.get("output", []),
-        error=job.get("error")
+        status=job.status,
+        output=job.output,
+        error=job.error
     )
\ No newline at end of file
@@ -1,8 +1,8 @@
 from pydantic import BaseModel, Field
+from dataclasses import dataclass, field
 from typing import Optional, List
 from enum import Enum
 from datetime import datetime
-import uuid
 
 class ScrapMode(str, Enum):
     WORD_FREQUENCY = "word-frequency"
@@ -16,6 +16,18 @@ class JobStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
+@dataclass(slots=True)
+class Job:
+    """Internal job record held in the in-memory job store."""
+    job_id: str
+    status: JobStatus
+    created_at: float # Epoch seconds
+    mode: ScrapMode
+    filename: str
+    user: str
+    output: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
 class JobResponse(BaseModel):
     job_id: str
     status: JobStatus
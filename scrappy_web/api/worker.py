@@ -1,12 +1,81 @@
 import subprocess
 import os
-import uuid
+import sys
+import io
 import logging
-from typing import Dict
+import multiprocessing
+import runpy
+import signal
+import threading
+import time
+import traceback
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from .config import settings
 from .models import JobStatus, ScrapMode
 
-# In-memory job store (Replace with DB in production)
-JOBS: Dict[str, dict] = {}
+class ShardedJobs:
+    """
+    Dict-like in-memory job store split into independently locked shards.
+    Entries expire ttl seconds after they were last set and are swept lazily.
+    """
+    
+    def __init__(self, n: int = 16, ttl: float = 3600):
+        self.n = n
+        self.ttl = ttl
+        # Each shard: (OrderedDict of key -> (expires_at, value) in expiry order, lock)
+        self.shards = [(OrderedDict(), threading.Lock()) for _ in range(n)]
+    
+    def _shard(self, key):
+        return self.shards[hash(key) % self.n]
+    
+    @staticmethod
+    def _sweep(entries: OrderedDict, now: float) -> None:
+        while entries:
+            key, (expires_at, _) = next(iter(entries.items()))
+            if expires_at > now:
+                break
+            del entries[key]
+    
+    def __setitem__(self, key, value) -> None:
+        entries, lock = self._shard(key)
+        now = time.monotonic()
+        with lock:
+            self._sweep(entries, now)
+            entries[key] = (now + self.ttl, value)
+            entries.move_to_end(key)
+    
+    def __getitem__(self, key):
+        entries, lock = self._shard(key)
+        with lock:
+            self._sweep(entries, time.monotonic())
+            return entries[key][1]
+    
+    def __delitem__(self, key) -> None:
+        entries, lock = self._shard(key)
+        with lock:
+            del entries[key]
+    
+    def __contains__(self, key) -> bool:
+        entries, lock = self._shard(key)
+        with lock:
+            self._sweep(entries, time.monotonic())
+            return key in entries
+    
+    def __len__(self) -> int:
+        return sum(len(entries) for entries, _ in self.shards)
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+# In-memory job store: job_id -> Job (Replace with DB in production)
+JOBS = ShardedJobs(ttl=settings.JOB_TTL_SECONDS)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,67 +83,227 @@ logger = logging.getLogger(__name__)
 
 SCRAPPY_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../ScrapPY.py"))
 PYTHON_PATH = os.sys.executable # Use the same python interpreter
+JOB_TIMEOUT = 300 # 5 minute timeout, enforced inside the worker from when the job starts
+JOB_TIMEOUT_GRACE = 30 # Extra wait before a worker that ignores its timeout is killed
+
+# Persistent worker processes keep ScrapPY's heavy imports warm between jobs
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+# Never submit more jobs than there are workers, so a submitted job starts running at once
+_pool_slots = threading.BoundedSemaphore(settings.WORKER_PROCESSES)
+# forkserver avoids forking the multi-threaded server; spawn where it isn't available
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+class JobTimeout(BaseException):
+    """Raised inside a pool worker when a job exceeds its timeout."""
+
+def _worker_init():
+    """Pre-import ScrapPY's dependencies once per worker process."""
+    for module in ("PyPDF2", "pandas", "scipy.stats"):
+        try:
+            __import__(module)
+        except ImportError:
+            pass # ScrapPY reports the missing dependency when the job runs
+
+class _CapturedFile(io.StringIO):
+    """In-memory stand-in for ScrapPY's output file. Keeps its contents after close."""
+    
+    contents: Optional[str] = None
+    
+    def close(self):
+        if not self.closed:
+            self.contents = self.getvalue()
+        super().close()
+
+def _raise_job_timeout(signum, frame):
+    raise JobTimeout()
+
+def _run_scrappy_inproc(
+    script_path: str, file_path: str, mode: str, output_file: str, timeout: float
+) -> Tuple[int, str, str, Optional[str]]:
+    """
+    Runs ScrapPY inside a pool worker, mirroring a subprocess call.
+    Writes to output_file are captured in memory instead of hitting disk.
+    Raises JobTimeout if the run takes longer than timeout seconds.
+    Returns (returncode, stdout, stderr, output).
+    """
+    stdout, stderr = io.StringIO(), io.StringIO()
+    captured = []
+    
+    def _open(path, mode="r", *args, **kwargs):
+        if path == output_file and "w" in mode:
+            captured.append(_CapturedFile())
+            return captured[-1]
+        return open(path, mode, *args, **kwargs)
+    
+    # Pool workers run jobs on their main thread, so SIGALRM can interrupt a stuck job
+    use_alarm = hasattr(signal, "setitimer")
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_job_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    
+    argv = sys.argv
+    sys.argv = [script_path, "-f", file_path, "-m", mode, "-o", output_file]
+    returncode = 0
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            runpy.run_path(script_path, init_globals={"open": _open}, run_name="__main__")
+    except SystemExit as e:
+        # Metadata mode and argparse errors exit explicitly
+        if isinstance(e.code, int):
+            returncode = e.code
+        elif e.code is not None:
+            stderr.write(f"{e.code}\n")
+            returncode = 1
+    except Exception:
+        stderr.write(traceback.format_exc())
+        returncode = 1
+    finally:
+        sys.argv = argv
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    
+    output = None
+    if captured:
+        f = captured[-1]
+        output = f.getvalue() if not f.closed else f.contents
+    return returncode, stdout.getvalue(), stderr.getvalue(), output
+
+def _submit(*args):
+    """
+    Submits a job to the shared pool, creating it if needed. Getting the pool and
+    submitting happen under one lock so a concurrent reset can't shut it down in between.
+    Returns (pool, future).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.WORKER_PROCESSES,
+                mp_context=_MP_CONTEXT,
+                initializer=_worker_init
+            )
+        return _pool, _pool.submit(*args)
+
+def _pool_processes(pool: ProcessPoolExecutor) -> list:
+    # Depends on the CPython-internal ProcessPoolExecutor._processes (3.9-3.13);
+    # there is no public way to reach the worker processes before 3.14.
+    return list((getattr(pool, "_processes", None) or {}).values())
+
+def _reset_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Tears down pool, killing its worker processes. shutdown() alone leaves a
+    busy (e.g. hung) worker running and holding its slot.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    for process in _pool_processes(pool):
+        process.kill()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _run_scrappy_subprocess(file_path: str, mode: str, output_file: str) -> Tuple[int, str, str, Optional[str]]:
+    """
+    Runs ScrapPY in a fresh interpreter. The output file is read back and removed.
+    Returns (returncode, stdout, stderr, output); stdout is only decoded in
+    metadata mode and stderr only on failure.
+    """
+    # Construct command securely (no shell=True)
+    cmd = [
+        PYTHON_PATH,
+        SCRAPPY_PATH,
+        "-f", file_path,
+        "-m", mode,
+        "-o", output_file
+    ]
+    
+    try:
+        # Capture raw bytes; decode only what the caller will use
+        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=-1)
+        try:
+            out, err = p.communicate(timeout=JOB_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.communicate()
+            raise
+        stdout = out.decode('utf-8', errors='replace') if mode == ScrapMode.METADATA.value else ""
+        stderr = err.decode('utf-8', errors='replace') if p.returncode != 0 else ""
+        output = None
+        if os.path.exists(output_file):
+            with open(output_file, "r") as f:
+                output = f.read()
+    finally:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+    return p.returncode, stdout, stderr, output
+
+def _run_scrappy(file_path: str, mode: str, output_file: str) -> Tuple[int, str, str, Optional[str]]:
+    """
+    Runs ScrapPY on the worker pool, falling back to a subprocess if the pool
+    is broken (e.g. a worker crashed while parsing a PDF).
+    """
+    with _pool_slots:
+        pool, future = _submit(_run_scrappy_inproc, SCRAPPY_PATH, file_path, mode, output_file, JOB_TIMEOUT)
+        try:
+            # The worker enforces JOB_TIMEOUT itself; this only catches workers stuck
+            # somewhere SIGALRM can't interrupt
+            return future.result(timeout=JOB_TIMEOUT + JOB_TIMEOUT_GRACE)
+        except FutureTimeoutError:
+            # The slot guarantees this job is running, so its worker is hung: kill the pool
+            # (other in-flight jobs see BrokenProcessPool and fall back to a subprocess)
+            logger.warning("Worker timed out, restarting worker pool")
+            _reset_pool(pool)
+            raise
+        except (BrokenProcessPool, CancelledError):
+            logger.warning("Worker pool broken, falling back to subprocess")
+            _reset_pool(pool)
+    return _run_scrappy_subprocess(file_path, mode, output_file)
 
 def run_scrappy_job(job_id: str, file_path: str, mode: ScrapMode):
     """
-    Executes ScrapPY as a subprocess to ensure isolation.
+    Executes ScrapPY in a separate worker process to ensure isolation.
     """
     logger.info(f"Starting job {job_id} with mode {mode}")
-    JOBS[job_id]["status"] = JobStatus.PROCESSING
+    job = JOBS[job_id]
+    job.status = JobStatus.PROCESSING
     
     output_file = f"{file_path}.txt"
     
     try:
-        # Construct command securely (no shell=True)
-        cmd = [
-            PYTHON_PATH,
-            SCRAPPY_PATH,
-            "-f", file_path,
-            "-m", mode.value,
-            "-o", output_file
-        ]
+        returncode, stdout, stderr, output = _run_scrappy(file_path, mode.value, output_file)
         
-        # Execute
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=False, # We handle return codes manually
-            timeout=300 # 5 minute timeout
-        )
-        
-        if result.returncode != 0:
-            logger.error(f"Job {job_id} failed: {result.stderr}")
-            JOBS[job_id]["status"] = JobStatus.FAILED
-            JOBS[job_id]["error"] = result.stderr
+        if returncode != 0:
+            logger.error(f"Job {job_id} failed: {stderr}")
+            job.status = JobStatus.FAILED
+            job.error = stderr
             return
 
-        # Read output
-        if os.path.exists(output_file):
-            with open(output_file, "r") as f:
-                lines = f.read().splitlines()
-            JOBS[job_id]["output"] = lines
-            # Cleanup output file
-            os.remove(output_file)
-        else:
+        if output is not None:
+            job.output = output.splitlines()
+        elif mode == ScrapMode.METADATA:
             # Metadata mode prints to stdout, not file
-            if mode == ScrapMode.METADATA:
-                 JOBS[job_id]["output"] = result.stdout.splitlines()
-            else:
-                JOBS[job_id]["output"] = []
+            job.output = stdout.splitlines()
+        else:
+            job.output = []
 
-        JOBS[job_id]["status"] = JobStatus.COMPLETED
+        job.status = JobStatus.COMPLETED
         logger.info(f"Job {job_id} completed successfully")
 
-    except subprocess.TimeoutExpired:
+    except (subprocess.TimeoutExpired, FutureTimeoutError, JobTimeout):
         logger.error(f"Job {job_id} timed out")
-        JOBS[job_id]["status"] = JobStatus.FAILED
-        JOBS[job_id]["error"] = "Job timed out"
+        job.status = JobStatus.FAILED
+        job.error = "Job timed out"
     except Exception as e:
         logger.exception(f"Job {job_id} encountered an error")
-        JOBS[job_id]["status"] = JobStatus.FAILED
-        JOBS[job_id]["error"] = str(e)
+        job.status = JobStatus.FAILED
+        job.error = str(e)
     finally:
+        # Re-store the job so its TTL runs from completion, not creation
+        JOBS[job_id] = job
         # Cleanup input file
         if os.path.exists(file_path):
             os.remove(file_path)
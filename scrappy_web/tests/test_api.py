@@ -1,12 +1,16 @@
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch
+import hmac
 import os
+import signal
+import time
 import sys
 
 # Set test environment variables before importing app
 os.environ["SCRAPPY_SECRET_KEY"] = "test-secret-key-minimum-32-characters-long"
 
+from scrappy_web.api import auth
 from scrappy_web.api.main import app, limiter
 from scrappy_web.api.models import JobStatus
 
@@ -15,6 +19,33 @@ limiter.enabled = False
 
 client = TestClient(app)
 
+real_verify_password = auth.verify_password
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _fast_password_check():
+    """Skip password hashing during tests; each check is deliberately slow"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(auth, "verify_password", lambda plain, hashed: hmac.compare_digest(plain, "password123"))
+        yield
+
+
+@pytest.fixture
+def real_password_check(monkeypatch):
+    """Restore real password verification for tests that exercise it"""
+    monkeypatch.setattr(auth, "verify_password", real_verify_password)
+
+
+@pytest.fixture(scope="module")
+def auth_headers():
+    """Get valid auth headers, minted once per module"""
+    response = client.post(
+        "/api/v1/auth/token",
+        data={"username": "admin", "password": "password123"}
+    )
+    token = response.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
 
 class TestAuth:
     """Authentication endpoint tests"""
@@ -46,20 +77,79 @@ class TestAuth:
             data={"username": "notauser", "password": "password123"}
         )
         assert response.status_code == 401
+    
+    def test_unknown_user_still_runs_hash_check(self, real_password_check):
+        """Unknown usernames are checked against the dummy hash"""
+        auth._verify_cache.clear()
+        with patch.object(auth, "_ph") as ph:
+            ph.verify.return_value = True
+            assert auth.authenticate_user("notauser", "password123") is None
+        ph.verify.assert_called_once()
+        assert ph.verify.call_args[0][0] == auth.DUMMY_HASH
+    
+    def test_failed_login_not_cached(self, real_password_check):
+        """Failed checks, including unknown users against the dummy hash, always re-hash"""
+        auth._verify_cache.clear()
+        assert auth.authenticate_user("ghost0", "guess1") is None
+        assert auth.authenticate_user("admin", "guess1") is None
+        assert len(auth._verify_cache) == 0
+        with patch.object(auth, "_ph") as ph:
+            ph.verify.return_value = False
+            assert auth.authenticate_user("ghost1", "guess1") is None
+        ph.verify.assert_called_once()
+    
+    def test_legacy_bcrypt_hash_verifies(self, real_password_check):
+        """Existing bcrypt hashes are still accepted"""
+        hashed = auth.bcrypt.hashpw(b"password123", auth.bcrypt.gensalt(rounds=4)).decode()
+        assert auth.verify_password("password123", hashed)
+        assert not auth.verify_password("wrongpassword", hashed)
+    
+    def test_get_user(self):
+        """User lookup matches exact usernames only"""
+        assert auth.get_user(auth.FAKE_USERS_DB, "admin")["username"] == "admin"
+        assert auth.get_user(auth.FAKE_USERS_DB, "admi") is None
+        assert auth.get_user(auth.FAKE_USERS_DB, "admin ") is None
+    
+    def test_verify_password_cached(self, real_password_check):
+        """Repeated verification of the same pair skips hashing"""
+        auth._verify_cache.clear()
+        hashed = auth.FAKE_USERS_DB["admin"]["hashed_password"]
+        assert auth.verify_password("password123", hashed)
+        with patch.object(auth, "_ph") as ph:
+            assert auth.verify_password("password123", hashed)
+        ph.verify.assert_not_called()
 
 
-class TestJobCreation:
-    """Job submission endpoint tests"""
+class TestTokenCache:
+    """Verified token cache tests"""
     
-    @pytest.fixture
-    def auth_headers(self):
-        """Get valid auth headers"""
+    def test_token_cached_after_first_use(self):
+        """A verified token is served from the cache on later requests"""
         response = client.post(
             "/api/v1/auth/token",
             data={"username": "admin", "password": "password123"}
         )
         token = response.json()["access_token"]
-        return {"Authorization": f"Bearer {token}"}
+        headers = {"Authorization": f"Bearer {token}"}
+        client.get("/api/v1/jobs/nonexistent-job-id", headers=headers)
+        assert auth._token_cache_key(token) in auth._token_cache
+        with patch.object(auth.jwt, "decode", side_effect=AssertionError("decode called")):
+            response = client.get("/api/v1/jobs/nonexistent-job-id", headers=headers)
+        assert response.status_code == 404
+    
+    def test_expired_cached_token_rejected(self):
+        """An expired cache entry is evicted and the token re-verified"""
+        auth._token_cache[auth._token_cache_key("stale-token")] = (0, auth.FAKE_USERS_DB["admin"])
+        response = client.get(
+            "/api/v1/jobs/nonexistent-job-id",
+            headers={"Authorization": "Bearer stale-token"}
+        )
+        assert response.status_code == 401
+        assert auth._token_cache_key("stale-token") not in auth._token_cache
+
+
+class TestJobCreation:
+    """Job submission endpoint tests"""
     
     @pytest.fixture
     def sample_pdf(self, tmp_path):
@@ -103,6 +193,8 @@ class TestJobCreation:
     
     def test_job_validates_pdf_magic_bytes(self, auth_headers):
         """Files with PDF content-type but wrong magic bytes are rejected"""
+        from scrappy_web.api.main import UPLOAD_DIR
+        before = set(os.listdir(UPLOAD_DIR))
         response = client.post(
             "/api/v1/jobs",
             headers=auth_headers,
@@ -111,19 +203,102 @@ class TestJobCreation:
         )
         assert response.status_code == 400
         assert "Invalid PDF" in response.json()["detail"]
+        assert set(os.listdir(UPLOAD_DIR)) == before
+    
+    def test_job_cleans_up_on_write_error(self, auth_headers, sample_pdf):
+        """A failed disk write leaves no partial upload behind"""
+        from scrappy_web.api.main import UPLOAD_DIR
+        before = set(os.listdir(UPLOAD_DIR))
+        with patch("aiofiles.threadpool.binary.AsyncBufferedIOBase.write", side_effect=OSError("disk full")), \
+                open(sample_pdf, "rb") as f, pytest.raises(OSError):
+            client.post(
+                "/api/v1/jobs",
+                headers=auth_headers,
+                data={"mode": "full", "consent_acknowledged": "true"},
+                files={"file": ("test.pdf", f, "application/pdf")}
+            )
+        assert set(os.listdir(UPLOAD_DIR)) == before
+    
+    def test_job_rejects_oversized_file(self, auth_headers, sample_pdf):
+        """Uploads over the size limit return 413 and leave nothing on disk"""
+        from scrappy_web.api.main import UPLOAD_DIR, settings
+        before = set(os.listdir(UPLOAD_DIR))
+        with patch.object(settings, "MAX_FILE_SIZE_BYTES", 16), \
+                patch("scrappy_web.api.main.aiofiles.open", side_effect=AssertionError("file opened")), \
+                open(sample_pdf, "rb") as f:
+            response = client.post(
+                "/api/v1/jobs",
+                headers=auth_headers,
+                data={"mode": "full", "consent_acknowledged": "true"},
+                files={"file": ("test.pdf", f, "application/pdf")}
+            )
+        assert response.status_code == 413
+        assert response.json()["detail"] == settings.MAX_FILE_SIZE_ERROR
+        assert set(os.listdir(UPLOAD_DIR)) == before
 
 
 class TestJobRetrieval:
     """Job status and result retrieval tests"""
     
-    @pytest.fixture
-    def auth_headers(self):
-        response = client.post(
-            "/api/v1/auth/token",
-            data={"username": "admin", "password": "password123"}
+    def test_get_created_job(self, auth_headers):
+        """A submitted job can be polled; its result is unavailable until finished"""
+        with patch("scrappy_web.api.main.run_scrappy_job"):
+            response = client.post(
+                "/api/v1/jobs",
+                headers=auth_headers,
+                data={"mode": "full", "consent_acknowledged": "true"},
+                files={"file": ("test.pdf", b"%PDF-1.4\n%%EOF", "application/pdf")}
+            )
+        assert response.status_code == 200
+        job_id = response.json()["job_id"]
+        
+        response = client.get(f"/api/v1/jobs/{job_id}", headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "queued"
+        assert data["mode"] == "full"
+        assert data["filename"] == "test.pdf"
+        assert data["created_at"].endswith("Z")
+        
+        etag = response.headers["ETag"]
+        response = client.get(
+            f"/api/v1/jobs/{job_id}",
+            headers={**auth_headers, "If-None-Match": etag}
         )
-        token = response.json()["access_token"]
-        return {"Authorization": f"Bearer {token}"}
+        assert response.status_code == 304
+        assert response.content == b""
+        
+        response = client.get(f"/api/v1/jobs/{job_id}/result", headers=auth_headers)
+        assert response.status_code == 400
+        
+        from scrappy_web.api.main import UPLOAD_DIR
+        os.remove(os.path.join(UPLOAD_DIR, f"{job_id}.pdf"))
+    
+    def test_get_finished_job_result(self, auth_headers):
+        """Finished jobs return their output with an ETag; repeat polls get 304"""
+        from scrappy_web.api.models import Job, ScrapMode
+        from scrappy_web.api.worker import JOBS
+        JOBS["finished-job"] = Job(
+            job_id="finished-job",
+            status=JobStatus.COMPLETED,
+            created_at=0,
+            mode=ScrapMode.FULL,
+            filename="test.pdf",
+            user="admin",
+            output=["alpha", "beta"]
+        )
+        try:
+            response = client.get("/api/v1/jobs/finished-job/result", headers=auth_headers)
+            assert response.status_code == 200
+            assert response.json()["output"] == ["alpha", "beta"]
+            
+            response = client.get(
+                "/api/v1/jobs/finished-job/result",
+                headers={**auth_headers, "If-None-Match": response.headers["ETag"]}
+            )
+            assert response.status_code == 304
+        finally:
+            del JOBS["finished-job"]
     
     def test_get_nonexistent_job(self, auth_headers):
         """Requesting non-existent job returns 404"""
@@ -142,6 +317,178 @@ class TestJobRetrieval:
         assert response.status_code == 404
 
 
+class TestJobStore:
+    """Sharded in-memory job store tests"""
+    
+    def test_dict_like_access(self):
+        """Store supports the dict operations the API relies on"""
+        from scrappy_web.api.worker import ShardedJobs
+        jobs = ShardedJobs(n=4)
+        jobs["a"] = {"status": JobStatus.QUEUED}
+        assert "a" in jobs
+        assert jobs["a"]["status"] == JobStatus.QUEUED
+        assert jobs.get("missing") is None
+        assert len(jobs) == 1
+    
+    def test_finished_job_ttl_refreshed(self, tmp_path):
+        """A job's TTL restarts when it finishes"""
+        from scrappy_web.api import worker
+        from scrappy_web.api.models import Job, ScrapMode
+        jobs = worker.ShardedJobs(n=1, ttl=60)
+        jobs["j"] = Job(
+            job_id="j",
+            status=JobStatus.QUEUED,
+            created_at=0,
+            mode=ScrapMode.FULL,
+            filename="test.pdf",
+            user="admin"
+        )
+        entries = jobs.shards[0][0]
+        created_expiry = entries["j"][0]
+        input_file = tmp_path / "in.pdf"
+        input_file.write_bytes(b"%PDF-")
+        with patch.object(worker, "JOBS", jobs), \
+                patch.object(worker, "_run_scrappy", return_value=(0, "", "", "alpha\n")), \
+                patch.object(worker.time, "monotonic", return_value=time.monotonic() + 30):
+            worker.run_scrappy_job("j", str(input_file), ScrapMode.FULL)
+        assert jobs["j"].status == JobStatus.COMPLETED
+        assert entries["j"][0] > created_expiry
+    
+    def test_entries_expire(self):
+        """Entries past their TTL are swept on access"""
+        from scrappy_web.api.worker import ShardedJobs
+        jobs = ShardedJobs(n=4, ttl=0)
+        jobs["a"] = {"status": JobStatus.QUEUED}
+        assert "a" not in jobs
+        assert len(jobs) == 0
+
+
+@pytest.fixture
+def single_worker_pool():
+    """Run pool tests against a fresh single-process worker pool"""
+    from scrappy_web.api import worker
+    import threading
+    
+    def _teardown():
+        if worker._pool is not None:
+            worker._reset_pool(worker._pool)
+    
+    _teardown()
+    with patch.object(worker.settings, "WORKER_PROCESSES", 1), \
+            patch.object(worker, "_pool_slots", threading.BoundedSemaphore(1)):
+        yield worker
+        _teardown()
+
+
+class TestWorker:
+    """ScrapPY worker execution tests"""
+    
+    def test_inproc_run_captures_output(self, tmp_path):
+        """In-process runs pass arguments and capture stdout and exit code"""
+        from scrappy_web.api import worker
+        script = tmp_path / "fake_scrappy.py"
+        script.write_text(
+            "import sys\n"
+            "print(' '.join(sys.argv[1:]))\n"
+            "sys.exit(0)\n"
+        )
+        returncode, stdout, stderr, output = worker._run_scrappy_inproc(
+            str(script), "in.pdf", "metadata", "out.txt", 30
+        )
+        assert returncode == 0
+        assert stdout.splitlines() == ["-f in.pdf -m metadata -o out.txt"]
+        assert stderr == ""
+        assert output is None
+    
+    def test_inproc_run_captures_output_file(self, tmp_path):
+        """Writes to the output file are kept in memory, not on disk"""
+        from scrappy_web.api import worker
+        script = tmp_path / "fake_scrappy.py"
+        script.write_text(
+            "import sys\n"
+            "with open(sys.argv[-1], 'w+') as file:\n"
+            "    file.write('alpha\\nbeta\\n')\n"
+            "file.close()\n"
+        )
+        output_file = tmp_path / "out.txt"
+        returncode, _, _, output = worker._run_scrappy_inproc(
+            str(script), "in.pdf", "full", str(output_file), 30
+        )
+        assert returncode == 0
+        assert output.splitlines() == ["alpha", "beta"]
+        assert not output_file.exists()
+    
+    def test_inproc_run_reports_errors(self, tmp_path):
+        """Exceptions in ScrapPY become a non-zero exit code with a traceback"""
+        from scrappy_web.api import worker
+        script = tmp_path / "fake_scrappy.py"
+        script.write_text("raise RuntimeError('boom')\n")
+        returncode, _, stderr, _ = worker._run_scrappy_inproc(str(script), "in.pdf", "full", "out.txt", 30)
+        assert returncode == 1
+        assert "RuntimeError: boom" in stderr
+    
+    def test_inproc_run_times_out(self, tmp_path):
+        """Runs longer than the timeout are interrupted"""
+        from scrappy_web.api import worker
+        script = tmp_path / "fake_scrappy.py"
+        script.write_text("import time\ntime.sleep(60)\n")
+        with pytest.raises(worker.JobTimeout):
+            worker._run_scrappy_inproc(str(script), "in.pdf", "full", "out.txt", 0.5)
+    
+    def test_queued_job_gets_full_timeout(self, single_worker_pool, tmp_path):
+        """Time spent waiting for a free worker doesn't count toward a job's timeout"""
+        from concurrent.futures import ThreadPoolExecutor
+        worker = single_worker_pool
+        script = tmp_path / "fake_scrappy.py"
+        script.write_text("import time\ntime.sleep(1)\n")
+        with patch.object(worker, "SCRAPPY_PATH", str(script)), patch.object(worker, "JOB_TIMEOUT", 1.5), \
+                patch.object(worker, "_reset_pool", wraps=worker._reset_pool) as reset_pool:
+            with ThreadPoolExecutor(max_workers=2) as threads:
+                runs = [threads.submit(worker._run_scrappy, "in.pdf", "full", "out.txt") for _ in range(2)]
+                results = [run.result() for run in runs]
+        assert [returncode for returncode, _, _, _ in results] == [0, 0]
+        reset_pool.assert_not_called()
+    
+    def test_pool_timeout_keeps_pool(self, single_worker_pool, tmp_path):
+        """A job that hits its timeout fails without restarting the pool"""
+        worker = single_worker_pool
+        script = tmp_path / "fake_scrappy.py"
+        script.write_text("import time\ntime.sleep(60)\n")
+        with patch.object(worker, "SCRAPPY_PATH", str(script)), patch.object(worker, "JOB_TIMEOUT", 1), \
+                patch.object(worker, "_reset_pool", wraps=worker._reset_pool) as reset_pool:
+            with pytest.raises(worker.JobTimeout):
+                worker._run_scrappy("in.pdf", "full", "out.txt")
+        reset_pool.assert_not_called()
+    
+    @pytest.mark.skipif(not hasattr(signal, "SIGALRM"), reason="needs SIGALRM")
+    def test_pool_kills_worker_ignoring_timeout(self, single_worker_pool, tmp_path):
+        """A worker that can't be interrupted is killed once the grace period passes"""
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+        worker = single_worker_pool
+        quick = tmp_path / "quick.py"
+        quick.write_text("")
+        hung = tmp_path / "hung.py"
+        hung.write_text(
+            "import signal, time\n"
+            "signal.signal(signal.SIGALRM, signal.SIG_IGN)\n"
+            "time.sleep(60)\n"
+        )
+        # Warm the pool so worker startup doesn't count toward the grace period
+        with patch.object(worker, "SCRAPPY_PATH", str(quick)):
+            worker._run_scrappy("in.pdf", "full", "out.txt")
+        pool = worker._pool
+        processes = worker._pool_processes(pool)
+        with patch.object(worker, "SCRAPPY_PATH", str(hung)), patch.object(worker, "JOB_TIMEOUT", 1), \
+                patch.object(worker, "JOB_TIMEOUT_GRACE", 1):
+            with pytest.raises(FutureTimeoutError):
+                worker._run_scrappy("in.pdf", "full", "out.txt")
+        assert worker._pool is not pool
+        assert processes
+        for process in processes:
+            process.join(timeout=5)
+            assert not process.is_alive()
+
+
 class TestRootEndpoint:
     """Root endpoint tests"""
     
@@ -152,6 +499,28 @@ class TestRootEndpoint:
         assert response.headers["location"] == "/ui/"
 
 
+class TestCORS:
+    """CORS middleware tests"""
+    
+    def test_api_preflight_allowed(self):
+        """Cross-origin preflight requests to the API get CORS headers"""
+        response = client.options(
+            "/api/v1/jobs",
+            headers={
+                "Origin": "https://example.com",
+                "Access-Control-Request-Method": "POST"
+            }
+        )
+        assert response.status_code == 200
+        assert "access-control-allow-origin" in response.headers
+    
+    def test_ui_skips_cors(self):
+        """Static UI requests are served without CORS processing"""
+        response = client.get("/ui/", headers={"Origin": "https://example.com"})
+        assert response.status_code == 200
+        assert "access-control-allow-origin" not in response.headers
+
+
 class TestConfig:
     """Configuration validation tests"""
     
@@ -165,4 +534,5 @@ class TestConfig:
         """Only PDF content type is allowed"""
         from scrappy_web.api.config import settings
         assert "application/pdf" in settings.ALLOWED_CONTENT_TYPES
+        assert isinstance(settings.ALLOWED_CONTENT_TYPES, frozenset)
         assert len(settings.ALLOWED_CONTENT_TYPES) == 1